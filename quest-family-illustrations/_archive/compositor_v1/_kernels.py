@@ -0,0 +1,39 @@
+"""
+Optional Numba kernels for the compositor's per-pixel hot paths.
+
+Importing this module requires numba; compositor.py guards the import and
+falls back to its NumPy implementations when numba isn't installed. The
+kernels operate on uint8 arrays in place and mirror the NumPy semantics
+exactly (white-falloff LUT apply, bottom-up feet-row scan).
+"""
+
+from numba import njit, prange
+
+
+@njit(parallel=True, cache=True)
+def apply_falloff_lut(rgba, lut):
+    """In-place alpha *= lut[max(R,G,B)] >> 8 over an HxWx4 uint8 array."""
+    h, w = rgba.shape[0], rgba.shape[1]
+    for y in prange(h):
+        for x in range(w):
+            r = rgba[y, x, 0]
+            g = rgba[y, x, 1]
+            b = rgba[y, x, 2]
+            lum = r if r >= g and r >= b else (g if g >= b else b)
+            rgba[y, x, 3] = (rgba[y, x, 3] * lut[lum]) >> 8
+
+
+@njit(cache=True)
+def lowest_opaque_row(alpha, threshold):
+    """Bottom-up scan for the last row with any alpha >= threshold.
+
+    Returns the row index, or the image height when no row qualifies —
+    same convention as compositor._lowest_opaque_row. Short-circuits on
+    the first qualifying row instead of reducing the whole array.
+    """
+    h, w = alpha.shape
+    for y in range(h - 1, -1, -1):
+        for x in range(w):
+            if alpha[y, x] >= threshold:
+                return y
+    return h
@@ -11,12 +11,26 @@ sprite_sheet path, allowing different characters with different faces.
 from __future__ import annotations
 
 import argparse
+import functools
 import json
 import sys
 from pathlib import Path
 
+import numpy as np
 from PIL import Image, ImageFilter
 
+try:
+    from . import _kernels
+except ImportError:
+    # numba is optional; the NumPy paths below are the fallback
+    _kernels = None
+
+try:
+    import orjson
+except ImportError:
+    # orjson is optional; stdlib json is the fallback
+    orjson = None
+
 NUM_POSES = 5
 # Alpha masking transition band (feathered edges)
 WHITE_LOW = 220
@@ -26,9 +40,42 @@ ALPHA_BLUR_RADIUS = 1  # Very slight blur for anti-aliasing
 SHADOW_OFFSET = (4, 6)
 SHADOW_BLUR_RADIUS = 8
 SHADOW_OPACITY = 0.35  # Fixed 30-40% opacity
+# Shadow color sampling runs on a background thumbnail reduced by this
+# factor; the dark-tone percentile average is stable under downsampling
+SHADOW_SAMPLE_REDUCE = 8
 # Ground alignment
 FEET_ALPHA_THRESHOLD = 10  # Minimum alpha to consider a pixel "opaque"
 
+# 256-entry falloff table indexed by max(R,G,B): 256 below the band (keep
+# alpha), 0 above it (transparent), linear ramp inside. Scaled by 256 so the
+# per-pixel apply is a multiply and a shift, no branches.
+_FALLOFF_LUT = np.empty(256, dtype=np.uint16)
+_FALLOFF_LUT[: WHITE_LOW + 1] = 256
+_FALLOFF_LUT[WHITE_HIGH:] = 0
+_band = np.arange(WHITE_LOW + 1, WHITE_HIGH)
+_FALLOFF_LUT[WHITE_LOW + 1 : WHITE_HIGH] = (
+    (WHITE_HIGH - _band) * 256 // (WHITE_HIGH - WHITE_LOW)
+)
+del _band
+
+
+def _parse_json(data: str | bytes):
+    """Parse JSON with orjson's single C-level pass when available."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _open_rgb(path: Path | str) -> Image.Image:
+    """
+    Open an image as RGB, hinting the decoder with draft() first.
+    For JPEG sources this lets libjpeg emit RGB (and a reduced scale when
+    a smaller size would do) during decompression; a no-op for PNG.
+    """
+    img = Image.open(path)
+    img.draft("RGB", img.size)
+    return img.convert("RGB")
+
 
 def _crop_poses(sheet: Image.Image) -> list[Image.Image]:
     """Split sprite sheet into 5 equal-width columns."""
@@ -47,71 +94,89 @@ def _crop_poses(sheet: Image.Image) -> list[Image.Image]:
 def _remove_white_background(img: Image.Image) -> Image.Image:
     """
     Make near-white pixels transparent with feathered/anti-aliased edges.
-    Uses a transition band for smooth alpha falloff. Returns RGBA.
+    Uses a transition band for smooth alpha falloff. Returns premultiplied
+    RGBa, which Pillow's resize/composite kernels use internally anyway —
+    emitting it here saves a round-trip conversion per downstream call.
     """
-    rgb = img.convert("RGB")
-    rgba = img.convert("RGBA")
-    data = list(rgba.getdata())
-    out = []
-    
-    for (r, g, b), (_, _, _, orig_a) in zip(rgb.getdata(), data):
-        # Use max(R,G,B) as luminance-like value
-        L = max(r, g, b)
-        
-        if L >= WHITE_HIGH:
-            # Fully transparent
-            out.append((r, g, b, 0))
-        elif L <= WHITE_LOW:
-            # Keep original alpha
-            out.append((r, g, b, orig_a))
-        else:
-            # Transition band: linear falloff
-            falloff = (WHITE_HIGH - L) / (WHITE_HIGH - WHITE_LOW)
-            new_alpha = int(orig_a * falloff)
-            out.append((r, g, b, new_alpha))
-    
-    rgba.putdata(out)
-    
+    arr = np.array(img.convert("RGBA"), dtype=np.uint8)
+    # Use max(R,G,B) as luminance-like value, then apply the falloff table:
+    # branchless multiply-and-shift instead of the three-way band comparison
+    if _kernels is not None:
+        _kernels.apply_falloff_lut(arr, _FALLOFF_LUT)
+    else:
+        lum = arr[..., :3].max(axis=2)
+        arr[..., 3] = (
+            (arr[..., 3].astype(np.uint16) * _FALLOFF_LUT[lum]) >> 8
+        ).astype(np.uint8)
     # Apply very slight blur to alpha channel only for anti-aliasing
     if ALPHA_BLUR_RADIUS > 0:
-        alpha_channel = rgba.split()[3]
-        alpha_blurred = alpha_channel.filter(ImageFilter.GaussianBlur(radius=ALPHA_BLUR_RADIUS))
-        # Recombine RGB with blurred alpha
-        rgb_channels = rgba.split()[:3]
-        rgba = Image.merge("RGBA", (*rgb_channels, alpha_blurred))
-    
-    return rgba
+        alpha_img = Image.fromarray(arr[..., 3], "L")
+        alpha_blurred = alpha_img.filter(ImageFilter.GaussianBlur(radius=ALPHA_BLUR_RADIUS))
+        arr[..., 3] = np.asarray(alpha_blurred, dtype=np.uint8)
+
+    # Premultiply RGB by the final alpha
+    alpha16 = arr[..., 3].astype(np.uint16)
+    arr[..., :3] = (
+        (arr[..., :3].astype(np.uint16) * alpha16[..., None]) // 255
+    ).astype(np.uint8)
+
+    return Image.fromarray(arr, "RGBa")
+
+
+@functools.lru_cache(maxsize=64)
+def _load_poses_rgba(sheet_path: str, mtime: float) -> tuple[Image.Image, ...]:
+    """
+    Load a sprite sheet, crop its poses, and remove the white background
+    from each (results are premultiplied RGBa). Cached so characters (and
+    scenes) sharing a sheet don't
+    repeat the decode and alpha-mask work. mtime is part of the key so an
+    edited sheet busts the cache. Callers must not mutate the results.
+    """
+    sheet = _open_rgb(sheet_path)
+    return tuple(_remove_white_background(p) for p in _crop_poses(sheet))
 
 
 def _lowest_opaque_row(pose_rgba: Image.Image) -> int:
     """
     Find the lowest row (closest to bottom) with any opaque pixels.
+    Accepts RGBA or premultiplied RGBa (alpha is band 3 in both).
     This represents where the feet are - the bottom of the visible sprite.
     Returns row index (0-based from top), or image height if none found.
     """
-    w, h = pose_rgba.size
-    alpha_channel = pose_rgba.split()[3]
-    
-    # Scan from bottom to top, return the first (lowest) row with opaque pixels
-    # This gives us the bottom edge of the visible sprite
-    for y in range(h - 1, -1, -1):
-        for x in range(w):
-            if alpha_channel.getpixel((x, y)) >= FEET_ALPHA_THRESHOLD:
-                return y
-    
+    alpha = np.asarray(pose_rgba.getchannel(3), dtype=np.uint8)
+
+    if _kernels is not None:
+        # JIT scan short-circuits on the first opaque row from the bottom
+        return int(_kernels.lowest_opaque_row(alpha, FEET_ALPHA_THRESHOLD))
+
+    # Reduce each row to "has any opaque pixel", then take the last such row
+    opaque_rows = np.flatnonzero(np.any(alpha >= FEET_ALPHA_THRESHOLD, axis=1))
+    if opaque_rows.size:
+        return int(opaque_rows[-1])
+
     # No opaque pixels found, return bottom
-    return h
+    return alpha.shape[0]
 
 
-def _resize_pose(pose: Image.Image, bg_width: int, bg_height: int, scale: float) -> Image.Image:
-    """Resize pose so height = scale * bg_height; width proportional."""
-    h_new = max(1, int(scale * bg_height))
+def _resize_pose(pose: Image.Image, h_new: int) -> Image.Image:
+    """Resize pose to the given height; width proportional."""
     w, h = pose.size
     ratio = h_new / h
     w_new = max(1, int(w * ratio))
     return pose.resize((w_new, h_new), Image.Resampling.LANCZOS)
 
 
+@functools.lru_cache(maxsize=256)
+def _resized_pose(sheet_path: str, mtime: float, idx: int, h_new: int) -> Image.Image:
+    """
+    Cached LANCZOS resize of one pose to a target height. Characters and
+    scenes that reuse a pose at the same effective scale (e.g. base_scale
+    with the default override) skip the repeat resample.
+    """
+    pose = _load_poses_rgba(sheet_path, mtime)[idx]
+    return _resize_pose(pose, h_new)
+
+
 def _sample_shadow_color(background: Image.Image, region: tuple[int, int, int, int]) -> tuple[int, int, int]:
     """
     Sample dark tones from a region of the background for shadow color.
@@ -129,39 +194,30 @@ def _sample_shadow_color(background: Image.Image, region: tuple[int, int, int, i
     
     # Crop region
     crop = background.crop((x0, y0, x1, y1))
-    pixels = list(crop.getdata())
-    
-    if not pixels:
+    pixels = np.asarray(crop, dtype=np.uint8).reshape(-1, 3)
+
+    if pixels.shape[0] == 0:
         return (50, 50, 50)
-    
-    # Calculate luminance for each pixel: (R + G + B) / 3
-    luminances = [(r + g + b) / 3 for r, g, b in pixels]
-    
+
+    # Luminance per pixel: (R + G + B) / 3
+    luminances = pixels.sum(axis=1, dtype=np.int32) / 3
+
     # Get 10th-25th percentile range (dark tones)
-    sorted_lums = sorted(luminances)
-    n = len(sorted_lums)
-    if n == 0:
-        return (50, 50, 50)
-    
+    sorted_lums = np.sort(luminances)
+    n = sorted_lums.size
     p10_idx = max(0, int(n * 0.1))
     p25_idx = min(n - 1, int(n * 0.25))
-    
-    # Find pixels in this luminance range
-    dark_pixels = [
-        pixels[i] for i in range(n)
-        if sorted_lums[p10_idx] <= luminances[i] <= sorted_lums[p25_idx]
-    ]
-    
-    if not dark_pixels:
-        # Fallback: use median of all pixels
+
+    # Mask pixels in this luminance range
+    dark_mask = (luminances >= sorted_lums[p10_idx]) & (luminances <= sorted_lums[p25_idx])
+    dark_pixels = pixels[dark_mask]
+
+    if dark_pixels.shape[0] == 0:
+        # Fallback: use all pixels
         dark_pixels = pixels
-    
-    # Average the dark pixels
-    avg_r = sum(p[0] for p in dark_pixels) // len(dark_pixels)
-    avg_g = sum(p[1] for p in dark_pixels) // len(dark_pixels)
-    avg_b = sum(p[2] for p in dark_pixels) // len(dark_pixels)
-    
-    return (avg_r, avg_g, avg_b)
+
+    avg_r, avg_g, avg_b = dark_pixels.mean(axis=0).astype(int)
+    return (int(avg_r), int(avg_g), int(avg_b))
 
 
 def _shadow_from_alpha(
@@ -169,37 +225,74 @@ def _shadow_from_alpha(
     offset: tuple[int, int],
     blur: int,
     shadow_color: tuple[int, int, int] | None = None,
-) -> tuple[Image.Image, int]:
+) -> tuple[Image.Image, tuple[int, int]]:
     """
     Create a shadow layer from alpha channel: offset, blur, with optional color.
-    If shadow_color is None, uses dark gray. Returns (shadow, pad).
+    If shadow_color is None, uses dark gray. Returns (shadow, origin) where
+    origin is the shadow's top-left relative to the sprite's paste position.
     """
-    w, h = alpha.size
     ox, oy = offset
+
+    # Work on the tight alpha bbox — the blur only needs kernel slack around
+    # the visible sprite, not the (often mostly empty) full pose rect
+    bbox = alpha.getbbox()
+    if bbox is None:
+        bbox = (0, 0, alpha.width, alpha.height)
+    bx0, by0 = bbox[0], bbox[1]
+    alpha = alpha.crop(bbox)
+
+    w, h = alpha.size
     pad = blur * 2 + max(abs(ox), abs(oy))
     tw, th = w + 2 * pad, h + 2 * pad
     layer = Image.new("RGBA", (tw, th), (0, 0, 0, 0))
     layer.paste(alpha, (pad + ox, pad + oy), alpha)
-    blurred = layer.filter(ImageFilter.GaussianBlur(radius=blur))
-    shadow = Image.new("RGBA", (tw, th), (0, 0, 0, 0))
-    pix = blurred.load()
-    
+    # Cheap big blur: box-downsample 4x, blur at radius/4, upsample bilinear.
+    # Indistinguishable for a soft low-opacity ground shadow, ~16x fewer
+    # pixels through the Gaussian kernel. Pillow's GaussianBlur is already a
+    # separable two-pass filter in C (O(r) per pixel, kernel truncated near
+    # 3 sigma), so there is no win in hand-rolling the convolution; the
+    # savings here come from shrinking N, not the kernel.
+    sw, sh = max(1, tw // 4), max(1, th // 4)
+    small = layer.resize((sw, sh), Image.Resampling.BOX)
+    small = small.filter(ImageFilter.GaussianBlur(radius=blur / 4))
+    blurred = small.resize((tw, th), Image.Resampling.BILINEAR)
+
     # Use provided color or default dark gray
     if shadow_color is None:
         shadow_color = (50, 50, 50)
-    
+
+    # Blurred alpha gives the shape; scale it by the fixed opacity with a
+    # point LUT and merge with solid color bands — all inside Pillow's C core
     r, g, b = shadow_color
     opacity = int(255 * SHADOW_OPACITY)
-    
-    for y in range(th):
-        for x in range(tw):
-            _, _, _, a = pix[x, y]
-            if a > 0:
-                # Use blurred alpha for shape, but apply fixed opacity
-                final_alpha = int(a * SHADOW_OPACITY)
-                shadow.putpixel((x, y), (r, g, b, final_alpha))
-    
-    return shadow, pad
+    scaled_a = blurred.getchannel("A").point(lambda v: (v * opacity) // 255)
+    shadow = Image.merge(
+        "RGBA",
+        (
+            Image.new("L", (tw, th), r),
+            Image.new("L", (tw, th), g),
+            Image.new("L", (tw, th), b),
+            scaled_a,
+        ),
+    )
+
+    return shadow, (bx0 - pad, by0 - pad)
+
+
+def _alpha_over(canvas: Image.Image, tile: Image.Image, pos: tuple[int, int]) -> None:
+    """
+    Alpha-composite tile onto canvas at pos (may be negative / off-canvas),
+    running the over-operator only on the overlapping rect.
+    """
+    x, y = pos
+    x0, y0 = max(x, 0), max(y, 0)
+    x1 = min(x + tile.width, canvas.width)
+    y1 = min(y + tile.height, canvas.height)
+    if x1 <= x0 or y1 <= y0:
+        return
+    if (x0, y0) != (x, y) or (x1 - x0, y1 - y0) != tile.size:
+        tile = tile.crop((x0 - x, y0 - y, x1 - x, y1 - y))
+    canvas.alpha_composite(tile, dest=(x0, y0))
 
 
 def _composite_one(
@@ -233,17 +326,17 @@ def _composite_one(
     shadow_y0 = max(0, paste_y + ph // 2)
     shadow_x1 = min(bw, paste_x + pw + pw // 4)
     shadow_y1 = min(bh, paste_y + ph + ph // 2 + oy * 2)
-    shadow_region = (shadow_x0, shadow_y0, shadow_x1, shadow_y1)
+    # background is a reduced thumbnail; scale the region to match
+    k = SHADOW_SAMPLE_REDUCE
+    shadow_region = (shadow_x0 // k, shadow_y0 // k, shadow_x1 // k, shadow_y1 // k)
     shadow_color = _sample_shadow_color(background, shadow_region)
 
-    alpha = pose_rgba.split()[3]
-    shadow_img, pad = _shadow_from_alpha(
+    alpha = pose_rgba.getchannel("A")
+    shadow_img, (sox, soy) = _shadow_from_alpha(
         alpha, SHADOW_OFFSET, SHADOW_BLUR_RADIUS, shadow_color
     )
-    sx = paste_x + ox - (pad + ox)
-    sy = paste_y + oy - (pad + oy)
-    canvas.paste(shadow_img, (sx, sy), shadow_img)
-    canvas.paste(pose_rgba, (paste_x, paste_y), pose_rgba)
+    _alpha_over(canvas, shadow_img, (paste_x + sox, paste_y + soy))
+    _alpha_over(canvas, pose_rgba, (paste_x, paste_y))
 
 
 def _validate_config(config: dict) -> None:
@@ -349,23 +442,29 @@ def composite(config: dict) -> Image.Image:
     _validate_config(config)
     
     bg_path = Path(config["background"])
-    background = Image.open(bg_path).convert("RGB")
+    background = _open_rgb(bg_path)
     bg_w, bg_h = background.size
     canvas = background.convert("RGBA")
 
+    # Reduced copy used only for shadow color sampling — touches far fewer
+    # bytes than cropping the full-resolution background per character
+    bg_thumb = background.resize(
+        (max(1, bg_w // SHADOW_SAMPLE_REDUCE), max(1, bg_h // SHADOW_SAMPLE_REDUCE)),
+        Image.Resampling.BILINEAR,
+    )
+
     # Determine base scale if present
     base_scale = config.get("base_scale")
 
     for c in config["characters"]:
-        # Load this character's sprite sheet
+        # Load this character's sprite sheet (cached across characters/scenes)
         sheet_path = Path(c["sprite_sheet"])
-        sheet = Image.open(sheet_path).convert("RGB")
-        poses = _crop_poses(sheet)
-        
+        sheet_mtime = sheet_path.stat().st_mtime
+        poses = _load_poses_rgba(str(sheet_path), sheet_mtime)
+
         # Get the specific pose
         idx = c["pose_index"]
-        pose = poses[idx].copy()
-        pose_rgba = _remove_white_background(pose)
+        pose_rgba = poses[idx]
         
         # Find feet row in original pose (before resize)
         feet_row_orig = _lowest_opaque_row(pose_rgba)
@@ -377,7 +476,10 @@ def composite(config: dict) -> Image.Image:
         else:
             scale = float(c["scale"])
         
-        pose_scaled = _resize_pose(pose_rgba, bg_w, bg_h, scale)
+        h_new = max(1, int(scale * bg_h))
+        # Resize runs on premultiplied RGBa; unpremultiply once here for the
+        # straight-alpha compositing step
+        pose_scaled = _resized_pose(str(sheet_path), sheet_mtime, idx, h_new).convert("RGBA")
         
         # Calculate feet row in scaled pose
         orig_h = pose_rgba.height
@@ -389,7 +491,7 @@ def composite(config: dict) -> Image.Image:
         
         _composite_one(
             canvas,
-            background,  # Pass original background for shadow sampling
+            bg_thumb,  # Reduced background for shadow sampling
             pose_scaled,
             float(c["x"]),
             float(c["y"]),
@@ -418,6 +520,9 @@ Examples:
   # Using config file (recommended for multi-character scenes):
   python -m src.compositor --config config/scenes/scene_1.json --output output/scene_1.png
 
+  # All scene configs in a directory, composited in one process:
+  python -m src.compositor --config-dir config/scenes --output output/
+
   # Using CLI arguments:
   python -m src.compositor \\
       --background backgrounds/scene_1.png \\
@@ -429,6 +534,11 @@ Examples:
         "--config",
         help="Path to JSON config file containing background and characters array"
     )
+    parser.add_argument(
+        "--config-dir",
+        help="Directory of scene JSON configs; each is composited in-process "
+             "to <output>/<config stem>.png (shares sprite-sheet caches)"
+    )
     parser.add_argument(
         "--background",
         help="Path to background PNG (ignored if --config provided)"
@@ -440,6 +550,31 @@ Examples:
     parser.add_argument("--output", required=True, help="Output PNG path")
     args = parser.parse_args()
 
+    # Batch mode: composite every scene config in a directory without
+    # spawning a subprocess per scene (one interpreter, shared caches)
+    if args.config_dir:
+        config_dir = Path(args.config_dir)
+        if not config_dir.is_dir():
+            print(f"Error: Config directory not found: {config_dir}", file=sys.stderr)
+            sys.exit(1)
+        scene_paths = sorted(config_dir.glob("*.json"))
+        if not scene_paths:
+            print(f"Error: No .json configs in {config_dir}", file=sys.stderr)
+            sys.exit(1)
+        out_dir = Path(args.output)
+        failures = 0
+        for scene_path in scene_paths:
+            out_path = out_dir / f"{scene_path.stem}.png"
+            try:
+                scene_config = _parse_json(scene_path.read_bytes())
+                composite_to_file(scene_config, str(out_path))
+            except (FileNotFoundError, ValueError, json.JSONDecodeError) as e:
+                print(f"Error: {scene_path.name}: {e}", file=sys.stderr)
+                failures += 1
+                continue
+            print(f"Saved: {out_path}")
+        sys.exit(1 if failures else 0)
+
     # Build config from either --config file or CLI args
     if args.config:
         # Config file mode
@@ -448,8 +583,7 @@ Examples:
             print(f"Error: Config file not found: {config_path}", file=sys.stderr)
             sys.exit(1)
         try:
-            with open(config_path, "r") as f:
-                config = json.load(f)
+            config = _parse_json(config_path.read_bytes())
         except json.JSONDecodeError as e:
             print(f"Error: Invalid JSON in config file: {e}", file=sys.stderr)
             sys.exit(1)
@@ -463,7 +597,7 @@ Examples:
             sys.exit(1)
         
         try:
-            characters = json.loads(args.characters)
+            characters = _parse_json(args.characters)
         except json.JSONDecodeError as e:
             print(f"Error: Invalid --characters JSON: {e}", file=sys.stderr)
             sys.exit(1)
@@ -0,0 +1,6 @@
+"""Make the archived compositor importable for the tests without installing it."""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / "_archive"))